@@ -2,17 +2,31 @@
 FastAPI Backend
 Provides REST API endpoints for PDF processing and chat
 """
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, UploadFile, File, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from typing import Optional
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+from typing import List, Optional
+import json
+import threading
 import uvicorn
 from pdf_processor import PDFProcessor
 from vector_store import VectorStore
 from chat_engine import ChatEngine
 import numpy as np
 
-app = FastAPI(title="PDF Chatbot API")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Load the Ollama model in the background so the first user doesn't pay for it
+    """
+    threading.Thread(target=chat_engine.warm_up, daemon=True).start()
+    yield
+
+
+app = FastAPI(title="PDF Chatbot API", lifespan=lifespan)
 
 # Enable CORS for Gradio integration
 app.add_middleware(
@@ -23,18 +37,22 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Server-side limits
+MAX_TOP_K = 20
+MAX_BATCH_QUERIES = 1000
+MAX_BATCH_PARALLEL = 4  # generations across all batch requests together
+MAX_BATCH_REQUESTS = 4  # open /chat/batch streams; each holds a worker thread
+
 # Initialize components
 pdf_processor = PDFProcessor()
 vector_store = VectorStore()
-chat_engine = ChatEngine()
-
-# Global state
-current_pdf_name = None
+chat_engine = ChatEngine(batch_parallel=MAX_BATCH_PARALLEL)
+batch_requests = threading.BoundedSemaphore(MAX_BATCH_REQUESTS)
 
 
 class ChatRequest(BaseModel):
     query: str
-    top_k: int = 3
+    top_k: int = Field(3, ge=1, le=MAX_TOP_K)
 
 
 class ChatResponse(BaseModel):
@@ -42,6 +60,13 @@ class ChatResponse(BaseModel):
     context_used: int
 
 
+class BatchChatRequest(BaseModel):
+    queries: List[str] = Field(..., min_length=1, max_length=MAX_BATCH_QUERIES)
+    top_k: int = Field(3, ge=1, le=MAX_TOP_K)
+    priorities: Optional[List[int]] = None  # lower value runs first
+    max_parallel: int = Field(2, ge=1, le=MAX_BATCH_PARALLEL)
+
+
 @app.get("/")
 async def root():
     return {"message": "PDF Chatbot API is running"}
@@ -52,32 +77,33 @@ async def upload_pdf(file: UploadFile = File(...)):
     """
     Upload and process PDF file
     """
-    global current_pdf_name
-    
     try:
         # Read PDF file
         pdf_bytes = await file.read()
         
-        # Process PDF
-        chunks, embeddings = pdf_processor.process_pdf(pdf_bytes)
-        
-        # Build vector store
-        vector_store.build_index(embeddings, chunks)
-        
-        current_pdf_name = file.filename
-        
-        return {
-            "message": "PDF processed successfully",
-            "filename": file.filename,
-            "chunks": len(chunks),
-            "status": "ready"
-        }
+        # Process PDF and build the new index off the event loop;
+        # searches keep using the current snapshot until it is swapped in
+        chunks, embeddings = await run_in_threadpool(pdf_processor.process_pdf, pdf_bytes)
+        snapshot = await run_in_threadpool(vector_store.build_index, embeddings, chunks, file.filename)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    
+    if snapshot is None:
+        raise HTTPException(
+            status_code=409,
+            detail="A newer upload or clear replaced this PDF while it was being processed"
+        )
+    
+    return {
+        "message": "PDF processed successfully",
+        "filename": file.filename,
+        "chunks": len(chunks),
+        "status": "ready"
+    }
 
 
 @app.post("/chat", response_model=ChatResponse)
-async def chat(request: ChatRequest):
+def chat(request: ChatRequest):
     """
     Chat with the PDF
     """
@@ -99,15 +125,56 @@ async def chat(request: ChatRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/chat/batch")
+def chat_batch(request: BatchChatRequest):
+    """
+    Ask many questions about the PDF at once
+    Streams one JSON line per answer as soon as it is ready
+    
+    Each open stream keeps a server worker thread busy while it waits for
+    answers, so only MAX_BATCH_REQUESTS may run at once; the rest get 429
+    and /chat always has worker threads left
+    """
+    if request.priorities is not None and len(request.priorities) != len(request.queries):
+        raise HTTPException(status_code=400, detail="priorities must have one entry per query")
+    
+    if not batch_requests.acquire(blocking=False):
+        raise HTTPException(status_code=429, detail="Too many batch requests running, try again later")
+    
+    try:
+        # Embed all questions and search the index in one go
+        query_embeddings = pdf_processor.generate_embeddings(request.queries)
+        context_chunks_list = vector_store.search_batch(query_embeddings, top_k=request.top_k)
+    except Exception as e:
+        batch_requests.release()
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    def stream_results():
+        try:
+            for result in chat_engine.chat_batch(
+                request.queries,
+                context_chunks_list,
+                priorities=request.priorities,
+                max_parallel=request.max_parallel
+            ):
+                yield json.dumps(result) + "\n"
+        finally:
+            batch_requests.release()
+    
+    return StreamingResponse(stream_results(), media_type="application/x-ndjson")
+
+
 @app.get("/status")
 async def status():
     """
     Get current status
     """
+    snapshot = vector_store.snapshot
     return {
-        "pdf_loaded": vector_store.is_initialized,
-        "current_pdf": current_pdf_name,
-        "chunks_count": len(vector_store.chunks) if vector_store.is_initialized else 0,
+        "pdf_loaded": snapshot is not None,
+        "current_pdf": snapshot.filename if snapshot is not None else None,
+        "chunks_count": len(snapshot.chunks) if snapshot is not None else 0,
+        "index_version": snapshot.version if snapshot is not None else None,
         "ollama_connected": chat_engine.check_ollama_connection()
     }
 
@@ -119,8 +186,6 @@ async def clear():
     """
     vector_store.clear()
     chat_engine.clear_history()
-    global current_pdf_name
-    current_pdf_name = None
     
     return {"message": "Cleared successfully"}
 
@@ -0,0 +1,160 @@
+"""
+Warm-up Benchmark
+Measures cold vs warm time-to-first-token and prefill time against a stub
+Ollama server that simulates model load and prompt evaluation costs
+"""
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+STUB_PORT = 11535
+LOAD_SECONDS = 1.5         # time to load the model into memory
+PREFILL_PER_TOKEN = 0.002  # time to evaluate one prompt token
+DECODE_PER_TOKEN = 0.02    # time to generate one output token
+RESPONSE_TOKENS = 5
+
+# The ollama client reads its host when it is imported
+os.environ["OLLAMA_HOST"] = f"http://127.0.0.1:{STUB_PORT}"
+from chat_engine import ChatEngine
+
+
+def parse_keep_alive(value) -> float:
+    """Convert an Ollama keep_alive value to seconds (negative means forever)"""
+    if value is None:
+        return 300
+    if isinstance(value, (int, float)):
+        return float("inf") if value < 0 else float(value)
+    units = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+    for unit in sorted(units, key=len, reverse=True):
+        if value.endswith(unit):
+            seconds = float(value[:-len(unit)]) * units[unit]
+            return float("inf") if seconds < 0 else seconds
+    raise ValueError(f"time: missing unit in duration \"{value}\"")
+
+
+class StubOllama:
+    """
+    Single-slot model server: unloads after keep_alive expires and keeps the
+    last evaluated prompt so a shared prefix is not evaluated twice
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.loaded_until = 0.0
+        self.cached_tokens = []
+
+    def evaluate(self, messages, keep_alive):
+        with self.lock:
+            load = 0.0
+            if time.time() > self.loaded_until:
+                time.sleep(LOAD_SECONDS)
+                load = LOAD_SECONDS
+                self.cached_tokens = []
+
+            tokens = [word for m in messages for word in (m["role"] + " " + m["content"]).split()]
+            reused = 0
+            for cached, token in zip(self.cached_tokens, tokens):
+                if cached != token:
+                    break
+                reused += 1
+            prefill = (len(tokens) - reused) * PREFILL_PER_TOKEN
+            time.sleep(prefill)
+
+            self.cached_tokens = tokens
+            self.loaded_until = time.time() + parse_keep_alive(keep_alive)
+            return load, prefill, len(tokens) - reused
+
+
+def make_handler(stub: StubOllama):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            if self.path != "/api/chat":
+                self.send_error(404)
+                return
+            try:
+                load, prefill, evaluated = stub.evaluate(body["messages"], body.get("keep_alive"))
+            except ValueError as e:
+                self.send_response(400)
+                self.end_headers()
+                self.wfile.write(json.dumps({"error": str(e)}).encode())
+                return
+
+            num_predict = (body.get("options") or {}).get("num_predict", RESPONSE_TOKENS)
+            final = {
+                "model": body["model"],
+                "message": {"role": "assistant", "content": ""},
+                "done": True,
+                "load_duration": int(load * 1e9),
+                "prompt_eval_duration": int(prefill * 1e9),
+                "prompt_eval_count": evaluated
+            }
+
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.end_headers()
+            if not body.get("stream", True):
+                time.sleep(num_predict * DECODE_PER_TOKEN)
+                final["message"]["content"] = "ok " * num_predict
+                self.wfile.write(json.dumps(final).encode())
+                return
+            for _ in range(num_predict):
+                chunk = {"model": body["model"], "message": {"role": "assistant", "content": "ok "}, "done": False}
+                self.wfile.write((json.dumps(chunk) + "\n").encode())
+                self.wfile.flush()
+                time.sleep(DECODE_PER_TOKEN)
+            self.wfile.write((json.dumps(final) + "\n").encode())
+
+    return Handler
+
+
+def measure(engine: ChatEngine, query: str, context_chunks) -> dict:
+    """Ask one question through the engine and return its timings"""
+    return engine.chat(query, context_chunks)["timings"]
+
+
+def run(warm: bool, context_chunks) -> list:
+    """Start a fresh stub server and ask two questions, optionally after warm-up"""
+    server = ThreadingHTTPServer(("127.0.0.1", STUB_PORT), make_handler(StubOllama()))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        engine = ChatEngine()
+        if warm:
+            engine.warm_up()
+        return [
+            measure(engine, "What is the main topic of the document?", context_chunks[:3]),
+            measure(engine, "Who is the intended audience?", context_chunks[1:4])
+        ]
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def benchmark():
+    """Print cold vs warm time-to-first-token and prefill time"""
+    context_chunks = [
+        {"chunk": {"text": " ".join(f"word{i}_{j}" for j in range(150))}}
+        for i in range(4)
+    ]
+
+    print("=" * 60)
+    print("Warm-up Benchmark (stub Ollama server)")
+    print(f"Load: {LOAD_SECONDS}s, prefill: {PREFILL_PER_TOKEN * 1000}ms/token")
+    print("Only the model load and the short system prompt are reused across")
+    print("questions; the document context is evaluated fresh every time")
+    print("=" * 60)
+    for label, warm in (("cold", False), ("warm", True)):
+        for turn, result in enumerate(run(warm, context_chunks), start=1):
+            print(
+                f"{label} turn {turn}: TTFT {result['ttft_ms']:7.1f}ms  "
+                f"load {result['load_ms']:7.1f}ms  prefill {result['prefill_ms']:6.1f}ms  "
+                f"({result['prompt_tokens']} tokens evaluated)"
+            )
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -3,18 +3,50 @@ Chat Engine Module
 Handles conversation with PDF using Ollama and RAG
 """
 import ollama
-from typing import List, Dict
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Dict, Iterator, Optional, Union
 import numpy as np
 
 
+# Kept byte-identical across requests so Ollama can reuse the evaluated prefix;
+# it is short, so the saving is small compared to the per-question context
+SYSTEM_PROMPT = """You are a helpful assistant that answers questions based on the provided document context.
+Please provide a detailed answer based on the document context. If the context doesn't contain enough information to answer the question, please say so."""
+
+
+def get_timings(response: Dict) -> Dict:
+    """
+    Extract load and prefill timings from an Ollama response (nanoseconds -> ms)
+    """
+    return {
+        "load_ms": response.get('load_duration', 0) / 1e6,
+        "prefill_ms": response.get('prompt_eval_duration', 0) / 1e6,
+        "prompt_tokens": response.get('prompt_eval_count', 0)
+    }
+
+
 class ChatEngine:
-    def __init__(self, model_name: str = "phi"):
+    def __init__(self, model_name: str = "phi", keep_alive: Union[float, str] = "30m",
+                 batch_parallel: int = 4):
         """
         Initialize chat engine with Ollama
         Make sure Ollama is running and the model is downloaded
+        keep_alive: how long Ollama keeps the model loaded after a request,
+        as a duration string ("30m", "2h") or seconds; -1 keeps it loaded forever
+        batch_parallel: most batch generations running at once across all chat_batch calls
         """
         self.model_name = model_name
+        self.keep_alive = keep_alive
         self.conversation_history = []
+        
+        # Batch generations wait here while interactive chats are in flight
+        self._scheduler = threading.Condition()
+        self._interactive_requests = 0
+        
+        # Shared by every chat_batch call so concurrent batches stay within the cap
+        self._batch_slots = threading.BoundedSemaphore(batch_parallel)
     
     def check_ollama_connection(self) -> bool:
         """
@@ -45,9 +77,31 @@ class ChatEngine:
             print("Make sure Ollama is running. Start it with: ollama serve")
             return False
     
-    def generate_response(self, query: str, context_chunks: List[Dict]) -> str:
+    def warm_up(self) -> bool:
         """
-        Generate response using RAG (Retrieval Augmented Generation)
+        Load the model ahead of the first user so they don't wait for it;
+        this also evaluates the (short) system prompt
+        """
+        try:
+            ollama.chat(
+                model=self.model_name,
+                messages=[
+                    {"role": "system", "content": SYSTEM_PROMPT},
+                    {"role": "user", "content": "Hello"}
+                ],
+                options={"num_predict": 1},
+                keep_alive=self.keep_alive
+            )
+            print(f"Model '{self.model_name}' warmed up (keep_alive={self.keep_alive})")
+            return True
+        except Exception as e:
+            print(f"Warning: could not warm up model '{self.model_name}': {str(e)}")
+            return False
+    
+    def build_messages(self, query: str, context_chunks: List[Dict]) -> List[Dict]:
+        """
+        Build chat messages with the static system prompt first and the
+        per-question document context last, so the shared prefix stays cacheable
         """
         # Build context from retrieved chunks
         context = "\n\n".join([
@@ -55,46 +109,133 @@ class ChatEngine:
             for i, chunk in enumerate(context_chunks)
         ])
         
-        # Create prompt with context
-        prompt = f"""You are a helpful assistant that answers questions based on the provided document context.
-
-Document Context:
-{context}
-
-Question: {query}
-
-Please provide a detailed answer based on the document context above. If the context doesn't contain enough information to answer the question, please say so."""
-
+        return [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": f"Document Context:\n{context}\n\nQuestion: {query}"}
+        ]
+    
+    def generate_response(self, query: str, context_chunks: List[Dict]) -> str:
+        """
+        Generate response using RAG (Retrieval Augmented Generation)
+        """
+        return self._generate(query, context_chunks)["response"]
+    
+    def _generate(self, query: str, context_chunks: List[Dict]) -> Dict:
+        """
+        Generate a response and return it with Ollama's load and prefill timings
+        Streams from Ollama so time-to-first-token can be measured as well
+        """
+        messages = self.build_messages(query, context_chunks)
+        
         try:
             # Generate response using Ollama
-            response = ollama.generate(
+            start = time.perf_counter()
+            first_token_ms = None
+            parts = []
+            response = {}
+            for response in ollama.chat(
                 model=self.model_name,
-                prompt=prompt,
-                stream=False
-            )
+                messages=messages,
+                stream=True,
+                keep_alive=self.keep_alive
+            ):
+                if first_token_ms is None:
+                    first_token_ms = (time.perf_counter() - start) * 1000
+                parts.append(response['message']['content'])
             
-            return response['response']
+            # The last streamed part carries Ollama's timing statistics
+            timings = get_timings(response)
+            timings["ttft_ms"] = first_token_ms
+            return {
+                "response": "".join(parts),
+                "timings": timings
+            }
         except Exception as e:
-            return f"Error generating response: {str(e)}. Make sure Ollama is running and the model is available."
+            return {
+                "response": f"Error generating response: {str(e)}. Make sure Ollama is running and the model is available.",
+                "timings": {}
+            }
     
     def chat(self, query: str, context_chunks: List[Dict]) -> Dict:
         """
         Complete chat function that generates response and updates history
         """
-        response = self.generate_response(query, context_chunks)
+        with self._scheduler:
+            self._interactive_requests += 1
+        try:
+            result = self._generate(query, context_chunks)
+        finally:
+            with self._scheduler:
+                self._interactive_requests -= 1
+                self._scheduler.notify_all()
         
         # Update conversation history
         self.conversation_history.append({
             "query": query,
-            "response": response,
+            "response": result["response"],
             "context_used": len(context_chunks)
         })
         
         return {
-            "response": response,
-            "context_chunks": context_chunks
+            "response": result["response"],
+            "context_chunks": context_chunks,
+            "timings": result["timings"]
         }
     
+    def _generate_batch_item(self, query: str, context_chunks: List[Dict]) -> Dict:
+        """
+        Generate one batch response, yielding to any interactive chat first
+        Interactive chats only take priority when a batch generation is about
+        to start; generations already running keep their Ollama slot
+        """
+        with self._batch_slots:
+            with self._scheduler:
+                self._scheduler.wait_for(lambda: self._interactive_requests == 0)
+            return self._generate(query, context_chunks)
+    
+    def chat_batch(self, queries: List[str], context_chunks_list: List[List[Dict]],
+                   priorities: Optional[List[int]] = None, max_parallel: int = 2) -> Iterator[Dict]:
+        """
+        Answer many questions with at most max_parallel generations at a time,
+        and at most batch_parallel across all batches running on this engine
+        Questions run in priority order (lower value first), then shortest prompt first
+        Yields results as they finish; "index" refers to the position in queries
+        Batch answers are not added to the conversation history
+        """
+        if max_parallel < 1:
+            raise Exception("max_parallel must be at least 1")
+        if len(context_chunks_list) != len(queries):
+            raise Exception("Expected one list of context chunks per query")
+        if priorities is not None and len(priorities) != len(queries):
+            raise Exception("Expected one priority per query")
+        
+        def sort_key(i):
+            prompt_length = len(self.build_messages(queries[i], context_chunks_list[i])[-1]["content"])
+            return (priorities[i] if priorities is not None else 0, prompt_length)
+        
+        order = sorted(range(len(queries)), key=sort_key)
+        
+        # The executor starts jobs in submission order, so this is the schedule
+        executor = ThreadPoolExecutor(max_workers=max_parallel)
+        try:
+            futures = {
+                executor.submit(self._generate_batch_item, queries[i], context_chunks_list[i]): i
+                for i in order
+            }
+            for future in as_completed(futures):
+                i = futures[future]
+                result = future.result()
+                yield {
+                    "index": i,
+                    "query": queries[i],
+                    "response": result["response"],
+                    "context_used": len(context_chunks_list[i]),
+                    "timings": result["timings"]
+                }
+        finally:
+            # Drop queued work if the caller stops reading early
+            executor.shutdown(wait=False, cancel_futures=True)
+    
     def clear_history(self):
         """
         Clear conversation history
@@ -0,0 +1,154 @@
+"""
+Tests for ChatEngine batch scheduling
+Ollama is replaced with a stub, so no server or model is needed
+"""
+import threading
+import time
+
+import pytest
+
+import chat_engine
+from chat_engine import ChatEngine
+
+
+def make_chunks(text):
+    return [{"chunk": {"text": text}}]
+
+
+def question_of(messages):
+    return messages[-1]["content"].rsplit("Question: ", 1)[1]
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    """Stub streaming ollama.chat and record the questions in the order they start"""
+    started = []
+
+    def fake_chat(model, messages, stream=False, keep_alive=None, **kwargs):
+        started.append(question_of(messages))
+        return [{"message": {"content": f"answer to {question_of(messages)}"}, "done": True,
+                 "prompt_eval_duration": 2_000_000}]
+
+    monkeypatch.setattr(chat_engine.ollama, "chat", fake_chat)
+    return started
+
+
+def test_chat_batch_orders_by_priority_then_shortest_prompt(calls):
+    engine = ChatEngine()
+    queries = ["long", "short", "urgent", "medium"]
+    contexts = [make_chunks("x " * 300), make_chunks("x"), make_chunks("x " * 500), make_chunks("x " * 50)]
+
+    list(engine.chat_batch(queries, contexts, priorities=[1, 1, 0, 1], max_parallel=1))
+
+    assert calls == ["urgent", "short", "medium", "long"]
+
+
+def test_chat_batch_without_priorities_runs_shortest_prompt_first(calls):
+    engine = ChatEngine()
+    queries = ["b", "a", "c"]
+    contexts = [make_chunks("x " * 20), make_chunks("x"), make_chunks("x " * 40)]
+
+    list(engine.chat_batch(queries, contexts, max_parallel=1))
+
+    assert calls == ["a", "b", "c"]
+
+
+def test_chat_batch_returns_one_result_per_index(calls):
+    engine = ChatEngine()
+    queries = [f"q{i}" for i in range(10)]
+    contexts = [make_chunks("x " * i) for i in range(10)]
+
+    results = list(engine.chat_batch(queries, contexts, max_parallel=3))
+
+    assert sorted(r["index"] for r in results) == list(range(10))
+    for r in results:
+        assert r["query"] == queries[r["index"]]
+        assert r["response"] == f"answer to {queries[r['index']]}"
+        assert r["context_used"] == 1
+        assert r["timings"]["prefill_ms"] == 2.0
+    assert engine.conversation_history == []
+
+
+def test_chat_batch_rejects_mismatched_lengths(calls):
+    engine = ChatEngine()
+
+    with pytest.raises(Exception, match="context chunks"):
+        list(engine.chat_batch(["a", "b"], [make_chunks("x")]))
+    with pytest.raises(Exception, match="priority"):
+        list(engine.chat_batch(["a"], [make_chunks("x")], priorities=[1, 2]))
+    with pytest.raises(Exception, match="max_parallel"):
+        list(engine.chat_batch(["a"], [make_chunks("x")], max_parallel=0))
+    assert calls == []
+
+
+def test_interactive_chat_is_served_before_queued_batch_items(monkeypatch):
+    events = []
+    release_first = threading.Event()
+
+    def fake_chat(model, messages, stream=False, keep_alive=None, **kwargs):
+        question = question_of(messages)
+        events.append(("start", question))
+        if question == "batch0":
+            release_first.wait(timeout=5)
+        elif question == "interactive":
+            # Stay in flight long enough for a queued batch item to try to start
+            time.sleep(0.2)
+        events.append(("end", question))
+        return [{"message": {"content": "ok"}, "done": True}]
+
+    monkeypatch.setattr(chat_engine.ollama, "chat", fake_chat)
+    engine = ChatEngine()
+    queries = ["batch0", "batch1", "batch2"]
+    contexts = [make_chunks("x"), make_chunks("x " * 10), make_chunks("x " * 20)]
+
+    results = []
+    batch = threading.Thread(target=lambda: results.extend(engine.chat_batch(queries, contexts, max_parallel=1)))
+    batch.start()
+    while ("start", "batch0") not in events:
+        time.sleep(0.01)
+
+    interactive = threading.Thread(target=engine.chat, args=("interactive", make_chunks("x")))
+    interactive.start()
+    while ("start", "interactive") not in events:
+        time.sleep(0.01)
+    release_first.set()
+
+    interactive.join(timeout=5)
+    batch.join(timeout=5)
+
+    assert len(results) == 3
+    assert events.index(("end", "interactive")) < events.index(("start", "batch1"))
+    assert events.index(("start", "batch1")) < events.index(("start", "batch2"))
+
+
+def test_concurrent_batches_share_one_parallelism_cap(monkeypatch):
+    lock = threading.Lock()
+    running = [0]
+    peak = [0]
+
+    def fake_chat(model, messages, stream=False, keep_alive=None, **kwargs):
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        time.sleep(0.02)
+        with lock:
+            running[0] -= 1
+        return [{"message": {"content": "ok"}, "done": True}]
+
+    monkeypatch.setattr(chat_engine.ollama, "chat", fake_chat)
+    engine = ChatEngine(batch_parallel=3)
+    queries = [f"q{i}" for i in range(12)]
+    contexts = [make_chunks("x")] * len(queries)
+
+    results = []
+    batches = [
+        threading.Thread(target=lambda: results.extend(engine.chat_batch(queries, contexts, max_parallel=3)))
+        for _ in range(2)
+    ]
+    for thread in batches:
+        thread.start()
+    for thread in batches:
+        thread.join(timeout=5)
+
+    assert len(results) == 2 * len(queries)
+    assert peak[0] == 3
@@ -0,0 +1,217 @@
+"""
+Tests for VectorStore search
+"""
+import gc
+import threading
+import time
+import weakref
+
+import numpy as np
+import pytest
+
+import vector_store
+from vector_store import VectorStore
+
+DIMENSION = 16
+
+
+def make_store(count=40, seed=0):
+    rng = np.random.default_rng(seed)
+    store = VectorStore(dimension=DIMENSION)
+    embeddings = rng.standard_normal((count, DIMENSION)).astype('float32')
+    store.build_index(embeddings, [{"text": f"chunk {i}", "chunk_id": i} for i in range(count)])
+    return store, rng
+
+
+def test_search_batch_matches_search_per_query():
+    store, rng = make_store()
+    queries = rng.standard_normal((7, DIMENSION)).astype('float32')
+
+    batch_results = store.search_batch(queries, top_k=5)
+
+    assert len(batch_results) == len(queries)
+    for query, batch_result in zip(queries, batch_results):
+        single_result = store.search(query, top_k=5)
+        assert [r["chunk"] for r in batch_result] == [r["chunk"] for r in single_result]
+        assert [r["rank"] for r in batch_result] == [1, 2, 3, 4, 5]
+        assert [r["score"] for r in batch_result] == pytest.approx([r["score"] for r in single_result])
+
+
+def test_search_batch_skips_missing_results_when_top_k_exceeds_chunks():
+    store, rng = make_store(count=3)
+
+    results = store.search_batch(rng.standard_normal((2, DIMENSION)), top_k=5)
+
+    assert [len(r) for r in results] == [3, 3]
+
+
+def test_search_batch_requires_index():
+    store = VectorStore(dimension=DIMENSION)
+
+    with pytest.raises(Exception, match="not initialized"):
+        store.search_batch(np.zeros((1, DIMENSION)))
+
+
+def make_generation(rng, version):
+    """Embeddings and chunks tagged with the snapshot version they belong to"""
+    count = 20 + (version % 5) * 30  # vary the size so a torn pairing shows up
+    embeddings = rng.standard_normal((count, DIMENSION)).astype('float32')
+    return embeddings, [{"text": f"v{version}", "version": version, "chunk_id": i} for i in range(count)]
+
+
+def test_concurrent_searches_never_see_torn_snapshots():
+    store = VectorStore(dimension=DIMENSION)
+    rng = np.random.default_rng(1)
+    version = 1
+    store.build_index(*make_generation(rng, version))
+
+    stop = threading.Event()
+    errors = []
+    searches = []
+
+    def reader():
+        count = 0
+        while not stop.is_set():
+            snapshot = store.snapshot
+            if snapshot is None:
+                continue
+            k = len(snapshot.chunks) // 2
+            query = snapshot.index.reconstruct(k)
+
+            # Pinned to the snapshot we read: every chunk must come from it
+            pinned = store.search_batch(np.stack([query, query]), top_k=3, snapshot=snapshot)
+            for results in pinned:
+                if {r["chunk"]["version"] for r in results} != {snapshot.version}:
+                    errors.append(("pinned", snapshot.version, results))
+                if results[0]["chunk"]["chunk_id"] != k:
+                    errors.append(("wrong chunk", snapshot.version, k, results[0]["chunk"]))
+
+            # Unpinned: the store may swap underneath, but one call sees one snapshot
+            try:
+                results = store.search_batch(np.stack([query, -query]), top_k=3)
+                single = store.search(query, top_k=3)
+            except Exception:
+                continue  # cleared between calls
+            if len({r["chunk"]["version"] for rs in results for r in rs}) != 1:
+                errors.append(("batch torn", results))
+            if len({r["chunk"]["version"] for r in single}) != 1:
+                errors.append(("search torn", single))
+            count += 1
+        searches.append(count)
+
+    readers = [threading.Thread(target=reader) for _ in range(4)]
+    for thread in readers:
+        thread.start()
+
+    published = []
+    deadline = time.time() + 2
+    while time.time() < deadline:
+        version += 1
+        if version % 10 == 0:
+            store.clear()
+            continue
+        snapshot = store.build_index(*make_generation(rng, version))
+        assert snapshot.version == version
+        published.append(weakref.ref(snapshot))
+        del snapshot
+        time.sleep(0.001)
+
+    stop.set()
+    for thread in readers:
+        thread.join()
+
+    assert errors == []
+    assert sum(searches) > 0
+    assert len(published) > 10
+
+    # Old snapshots are freed once readers let go; only the current one survives
+    # (none if the loop happened to end on a clear)
+    gc.collect()
+    current = store.snapshot
+    assert [ref() for ref in published if ref() is not None] == ([current] if current is not None else [])
+
+
+def gate_builds(monkeypatch, count=1):
+    """
+    Make the first count build_index calls pause mid-build
+    Returns one (started, release) pair of events per gated call
+    """
+    gates = [(threading.Event(), threading.Event()) for _ in range(count)]
+    normalize = vector_store.faiss.normalize_L2
+    calls = []
+
+    def gated_normalize(x):
+        calls.append(1)
+        if len(calls) <= count:
+            started, release = gates[len(calls) - 1]
+            started.set()
+            release.wait(timeout=5)
+        normalize(x)
+
+    monkeypatch.setattr(vector_store.faiss, "normalize_L2", gated_normalize)
+    return gates
+
+
+def start_build(store, results, name, embeddings, chunks, filename=None):
+    thread = threading.Thread(
+        target=lambda: results.update({name: store.build_index(embeddings, chunks, filename)}))
+    thread.start()
+    return thread
+
+
+def test_older_build_finishing_last_does_not_replace_newer(monkeypatch):
+    store = VectorStore(dimension=DIMENSION)
+    rng = np.random.default_rng(2)
+    [(started, release)] = gate_builds(monkeypatch)
+
+    results = {}
+    old = start_build(store, results, "old", *make_generation(rng, 1), filename="old.pdf")
+    started.wait(timeout=5)
+
+    new = store.build_index(*make_generation(rng, 2), filename="new.pdf")
+    release.set()
+    old.join(timeout=5)
+
+    assert results["old"] is None
+    assert store.snapshot is new
+    assert store.snapshot.filename == "new.pdf"
+
+
+def test_clear_during_build_is_not_undone(monkeypatch):
+    store = VectorStore(dimension=DIMENSION)
+    rng = np.random.default_rng(3)
+    [(started, release)] = gate_builds(monkeypatch)
+
+    results = {}
+    build = start_build(store, results, "built", *make_generation(rng, 1))
+    started.wait(timeout=5)
+
+    store.clear()
+    release.set()
+    build.join(timeout=5)
+
+    assert results["built"] is None
+    assert store.snapshot is None
+    assert not store.is_initialized
+
+
+def test_older_build_lands_until_newer_build_finishes(monkeypatch):
+    store = VectorStore(dimension=DIMENSION)
+    rng = np.random.default_rng(4)
+    (old_started, old_release), (new_started, new_release) = gate_builds(monkeypatch, count=2)
+
+    results = {}
+    old = start_build(store, results, "old", *make_generation(rng, 1), filename="old.pdf")
+    old_started.wait(timeout=5)
+    new = start_build(store, results, "new", *make_generation(rng, 2), filename="new.pdf")
+    new_started.wait(timeout=5)
+
+    old_release.set()
+    old.join(timeout=5)
+    assert store.snapshot is results["old"]
+    assert store.snapshot.filename == "old.pdf"
+
+    new_release.set()
+    new.join(timeout=5)
+    assert store.snapshot is results["new"]
+    assert store.snapshot.filename == "new.pdf"
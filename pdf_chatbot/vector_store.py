@@ -3,8 +3,23 @@ Vector Store Module
 Handles document storage and similarity search using FAISS
 """
 import faiss
+import threading
 import numpy as np
-from typing import List, Dict, Tuple
+from typing import List, Dict, Optional, Tuple
+
+
+class IndexSnapshot:
+    def __init__(self, index, chunks: List[Dict], version: int, filename: Optional[str] = None):
+        """
+        A FAISS index together with the chunks and source file it was built from
+        VectorStore never modifies a snapshot once published, so callers must
+        treat it (including the chunk dicts) as read-only; it is freed once
+        nothing references it
+        """
+        self.index = index
+        self.chunks = tuple(chunks)
+        self.version = version
+        self.filename = filename
 
 
 class VectorStore:
@@ -12,39 +27,97 @@ class VectorStore:
         """
         Initialize FAISS vector store
         dimension: embedding dimension (384 for all-MiniLM-L6-v2)
+        
+        Readers take the current snapshot with a single attribute read and
+        never lock; writers build a new snapshot aside and swap it in
         """
         self.dimension = dimension
-        self.index = None
-        self.chunks = []
-        self.is_initialized = False
+        self._snapshot = None
+        self._version = 0  # last version handed out to a build or clear
+        self._cleared_version = 0
+        self._write_lock = threading.Lock()
+    
+    @property
+    def snapshot(self) -> Optional[IndexSnapshot]:
+        """
+        Current snapshot, or None if no PDF is loaded
+        Hold on to the returned object to get a consistent view
+        """
+        return self._snapshot
+    
+    @property
+    def index(self):
+        snapshot = self._snapshot
+        return snapshot.index if snapshot is not None else None
     
-    def build_index(self, embeddings: np.ndarray, chunks: List[Dict]):
+    @property
+    def chunks(self) -> Tuple[Dict, ...]:
+        """
+        Chunks of the current snapshot (read-only, not copied)
+        """
+        snapshot = self._snapshot
+        return snapshot.chunks if snapshot is not None else ()
+    
+    @property
+    def is_initialized(self) -> bool:
+        return self._snapshot is not None
+    
+    def build_index(self, embeddings: np.ndarray, chunks: List[Dict],
+                    filename: Optional[str] = None) -> Optional[IndexSnapshot]:
         """
         Build FAISS index from embeddings and store chunks
+        Searches keep using the previous snapshot until the new one is swapped in
+        
+        The version is taken when the build starts, and the newest started
+        build wins: the new snapshot is discarded (and None returned) if a
+        build started later has already been swapped in, or if clear() was
+        called after this build started
         """
         if len(embeddings) == 0:
             raise Exception("No embeddings provided")
+        if len(embeddings) != len(chunks):
+            raise Exception("Expected one embedding per chunk")
+        
+        with self._write_lock:
+            self._version += 1
+            version = self._version
         
         # Normalize embeddings for cosine similarity
-        embeddings = embeddings.astype('float32')
+        embeddings = np.array(embeddings, dtype='float32')
         faiss.normalize_L2(embeddings)
         
         # Create FAISS index
-        self.index = faiss.IndexFlatIP(self.dimension)  # Inner product for cosine similarity
-        self.index.add(embeddings)
+        index = faiss.IndexFlatIP(self.dimension)  # Inner product for cosine similarity
+        index.add(embeddings)
+        
+        # Swap in the new snapshot; in-flight searches keep the old one
+        snapshot = IndexSnapshot(index, chunks, version, filename)
+        with self._write_lock:
+            current = self._snapshot
+            superseded = (
+                version < self._cleared_version or
+                (current is not None and current.version > version)
+            )
+            if not superseded:
+                self._snapshot = snapshot
         
-        # Store chunks
-        self.chunks = chunks
-        self.is_initialized = True
+        if superseded:
+            print(f"Discarded index version {version}: superseded by a newer build or clear")
+            return None
         
-        print(f"Vector store initialized with {len(chunks)} chunks")
+        print(f"Vector store initialized with {len(chunks)} chunks (version {snapshot.version})")
+        return snapshot
     
-    def search(self, query_embedding: np.ndarray, top_k: int = 3) -> List[Dict]:
+    def search(self, query_embedding: np.ndarray, top_k: int = 3,
+               snapshot: Optional[IndexSnapshot] = None) -> List[Dict]:
         """
         Search for similar chunks
         Returns top_k most similar chunks with their metadata
+        Searches the current snapshot unless a specific one is given
         """
-        if not self.is_initialized:
+        if snapshot is None:
+            snapshot = self._snapshot
+        if snapshot is None:
             raise Exception("Vector store not initialized. Please upload a PDF first.")
         
         # Normalize query embedding
@@ -53,26 +126,61 @@ class VectorStore:
         faiss.normalize_L2(query_embedding)
         
         # Search
-        distances, indices = self.index.search(query_embedding, top_k)
+        distances, indices = snapshot.index.search(query_embedding, top_k)
         
         # Retrieve chunks
         results = []
         for i, idx in enumerate(indices[0]):
-            if idx < len(self.chunks):
+            if 0 <= idx < len(snapshot.chunks):
                 results.append({
-                    "chunk": self.chunks[idx],
+                    "chunk": snapshot.chunks[idx],
                     "score": float(distances[0][i]),
                     "rank": i + 1
                 })
         
         return results
     
+    def search_batch(self, query_embeddings: np.ndarray, top_k: int = 3,
+                     snapshot: Optional[IndexSnapshot] = None) -> List[List[Dict]]:
+        """
+        Search for similar chunks for many queries with a single FAISS call
+        Returns one result list per query, in the same order as the queries
+        Searches the current snapshot unless a specific one is given
+        """
+        if snapshot is None:
+            snapshot = self._snapshot
+        if snapshot is None:
+            raise Exception("Vector store not initialized. Please upload a PDF first.")
+        
+        # Normalize query embeddings
+        query_embeddings = np.array(query_embeddings, dtype='float32').reshape(-1, self.dimension)
+        faiss.normalize_L2(query_embeddings)
+        
+        # Search
+        distances, indices = snapshot.index.search(query_embeddings, top_k)
+        
+        # Retrieve chunks
+        results = []
+        for q in range(len(indices)):
+            query_results = []
+            for i, idx in enumerate(indices[q]):
+                if 0 <= idx < len(snapshot.chunks):
+                    query_results.append({
+                        "chunk": snapshot.chunks[idx],
+                        "score": float(distances[q][i]),
+                        "rank": i + 1
+                    })
+            results.append(query_results)
+        
+        return results
+    
     def clear(self):
         """
         Clear the vector store
         """
-        self.index = None
-        self.chunks = []
-        self.is_initialized = False
+        with self._write_lock:
+            self._version += 1
+            self._cleared_version = self._version
+            self._snapshot = None
         print("Vector store cleared")
 